@@ -2,6 +2,7 @@ import type { McpServer } from "@modelcontextprotocol/sdk/server/mcp.js";
 import { z } from "zod";
 import type {
 	CkanApiResponse,
+	CkanDatastoreField,
 	CkanDatastoreResult,
 	CkanGroup,
 	CkanOrganization,
@@ -19,7 +20,12 @@ const CONFIG: CkanToolsConfig = {
   CKAN_BASE_URL: "https://ckan0.cf.opendata.inter.prod-toronto.ca/api/3/action",
   DEFAULT_SEARCH_ROWS: 100,
   DEFAULT_PREVIEW_LIMIT: 5,
+  MAX_RECORDS_LIMIT: 1000,
   REQUEST_TIMEOUT: 10000,
+  CACHE_TTL: 60 * 60 * 1000,
+  RECORDS_CACHE_TTL: 60 * 1000,
+  CACHE_MAX_ENTRIES: 500,
+  CACHE_MAX_BYTES: 8 * 1024 * 1024,
   RELEVANCE_WEIGHTS: {
     TITLE: 10,
     DESCRIPTION: 5,
@@ -34,43 +40,115 @@ const CONFIG: CkanToolsConfig = {
   }
 } as const;
 
-// Improved API calling with error handling and timeout
+// Shared by every CKAN request; the Workers runtime pools and reuses the upstream connections
+const CKAN_REQUEST_HEADERS: Record<string, string> = {
+  'Accept': 'application/json',
+  'User-Agent': 'Toronto-MCP-Server/1.0.0'
+};
+
+// In-memory response cache, shared by every session served from this isolate.
+// Map iteration order is insertion order, so the first key is the oldest entry.
+// Entries hold the raw response text rather than parsed objects: its size is known, and
+// each hit parses a private copy so no caller can mutate another session's result.
+const responseCache = new Map<string, { expires: number; body: string }>();
+let responseCacheBytes = 0;
+
+// Upper bound: JS strings take at most two bytes per UTF-16 code unit
+const bodyBytes = (body: string): number => body.length * 2;
+
+function deleteCachedResponse(endpoint: string): void {
+  const entry = responseCache.get(endpoint);
+  if (!entry) return;
+  responseCacheBytes -= bodyBytes(entry.body);
+  responseCache.delete(endpoint);
+}
+
+function getCachedResponse(endpoint: string): string | undefined {
+  const entry = responseCache.get(endpoint);
+  if (!entry) return undefined;
+  if (entry.expires <= Date.now()) {
+    deleteCachedResponse(endpoint);
+    return undefined;
+  }
+  return entry.body;
+}
+
+function setCachedResponse(endpoint: string, body: string, ttl: number): void {
+  // Re-inserting moves an overwritten key to the newest position instead of evicting another entry
+  deleteCachedResponse(endpoint);
+  const size = bodyBytes(body);
+  if (size > CONFIG.CACHE_MAX_BYTES) return;
+  while (
+    responseCache.size > 0 &&
+    (responseCache.size >= CONFIG.CACHE_MAX_ENTRIES ||
+      responseCacheBytes + size > CONFIG.CACHE_MAX_BYTES)
+  ) {
+    const oldest = responseCache.keys().next().value;
+    if (oldest === undefined) break;
+    deleteCachedResponse(oldest);
+  }
+  responseCache.set(endpoint, { expires: Date.now() + ttl, body });
+  responseCacheBytes += size;
+}
+
+// Datastore pages and counts can come from real-time resources, so they expire much sooner
+const cacheTtlFor = (endpoint: string): number =>
+  endpoint.startsWith('datastore_search') ? CONFIG.RECORDS_CACHE_TTL : CONFIG.CACHE_TTL;
+
+// Marks failures that ckanApiCall has already logged
+class CkanApiError extends Error {
+  name = "CkanApiError";
+}
+
+// Improved API calling with error handling, timeout and response caching
 async function ckanApiCall<T>(endpoint: string): Promise<T> {
+  const cachedBody = getCachedResponse(endpoint);
+  if (cachedBody !== undefined) {
+    return (JSON.parse(cachedBody) as CkanApiResponse<T>).result;
+  }
+
   const url = `${CONFIG.CKAN_BASE_URL}/${endpoint}`;
   
   try {
     const response = await fetch(url, {
       signal: AbortSignal.timeout(CONFIG.REQUEST_TIMEOUT),
-      headers: { 
-        'Accept': 'application/json',
-        'User-Agent': 'Toronto-MCP-Server/1.0.0'
-      }
+      headers: CKAN_REQUEST_HEADERS
     });
     
     if (!response.ok) {
       throw new Error(`CKAN API HTTP error: ${response.status} ${response.statusText}`);
     }
     
-    const json: CkanApiResponse<T> = await response.json();
+    const body = await response.text();
+    const json: CkanApiResponse<T> = JSON.parse(body);
     
     if (!json.success) {
       throw new Error(`CKAN API error: ${json.error?.message || 'Unknown API error'}`);
     }
     
+    setCachedResponse(endpoint, body, cacheTtlFor(endpoint));
     return json.result;
   } catch (error) {
+    // Logged once here; tool handlers skip re-logging CkanApiError
     if (error instanceof Error) {
       console.error(`CKAN API call failed for ${endpoint}:`, error.message);
-      throw new Error(`Failed to fetch from CKAN API: ${error.message}`);
+      throw new CkanApiError(`Failed to fetch from CKAN API: ${error.message}`);
     }
     throw error;
   }
 }
 
-// Helper function for tool responses (back to original working format)
+// Non-CKAN failures (e.g. an unexpected payload shape) are logged in full, stack included;
+// CKAN failures were already logged once with their endpoint
+function logToolError(tool: string, error: unknown): void {
+  if (error instanceof CkanApiError) return;
+  console.error(`Error in ${tool}:`, error);
+}
+
+// Helper function for tool responses: compact JSON, since indentation only costs the model tokens
 function createToolResponse(data: any) {
   return {
-    content: [{ type: "text" as const, text: JSON.stringify(data, null, 2) }]
+    content: [{ type: "text" as const, text: JSON.stringify(data) }]
   };
 }
 
@@ -78,21 +156,33 @@ function createToolResponse(data: any) {
 export const fetchCkanPackage = (packageId: string): Promise<CkanPackage> =>
   ckanApiCall(`package_show?id=${encodeURIComponent(packageId)}`);
 
+// Tools reject limits above MAX_RECORDS_LIMIT in their schemas; the clamp here is a backstop
+// so no caller can pull an entire large resource in one request
 export const fetchCkanResource = (resourceId: string, limit = 10, offset = 0): Promise<CkanDatastoreResult> =>
-  ckanApiCall(`datastore_search?id=${encodeURIComponent(resourceId)}&limit=${limit}&offset=${offset}`);
+  ckanApiCall(
+    `datastore_search?id=${encodeURIComponent(resourceId)}&limit=${Math.min(limit, CONFIG.MAX_RECORDS_LIMIT)}&offset=${offset}`
+  );
+
+export const fetchCkanPackageList = (limit: number, offset = 0): Promise<string[]> =>
+  ckanApiCall(`package_list?limit=${limit}&offset=${offset}`);
+
+// Solr's count of searchable datasets; package_list reads the database, so the two can differ
+export const fetchCkanPackageCount = (): Promise<number> =>
+  ckanApiCall<CkanSearchResult>('package_search?rows=0').then(result => result.count);
 
-export const fetchCkanPackageList = (): Promise<string[]> =>
-  ckanApiCall('package_list');
+// Searches differing only in surrounding or repeated whitespace share a cache entry. Case is kept:
+// Solr's AND/OR/NOT operators are case-sensitive.
+const normalizeSearchQuery = (query: string): string => query.trim().replace(/\s+/g, ' ');
 
-export const fetchCkanPackageSearch = (query: string): Promise<CkanSearchResult> =>
-  ckanApiCall(`package_search?q=${encodeURIComponent(query)}`);
+export const fetchCkanPackageSearch = (query: string, rows?: number): Promise<CkanSearchResult> =>
+  ckanApiCall(`package_search?q=${encodeURIComponent(normalizeSearchQuery(query))}${rows === undefined ? '' : `&rows=${rows}`}`);
 
 export const fetchCkanPackageSearchAdvanced = (
   query: string,
   rows = CONFIG.DEFAULT_SEARCH_ROWS,
   facets: string[] = []
 ): Promise<CkanSearchResult> => {
-  let endpoint = `package_search?q=${encodeURIComponent(query)}&rows=${rows}`;
+  let endpoint = `package_search?q=${encodeURIComponent(normalizeSearchQuery(query))}&rows=${rows}`;
   if (facets.length > 0) {
     endpoint += `&facet.field=${facets.map(f => encodeURIComponent(f)).join("&facet.field=")}`;
   }
@@ -115,8 +205,8 @@ export const fetchCkanDatastoreInfo = (resourceId: string): Promise<CkanDatastor
 class RelevanceScorer {
   private static readonly WEIGHTS = CONFIG.RELEVANCE_WEIGHTS;
   
-  static score(dataset: CkanPackage, query: string): number {
-    const lowerQuery = query.toLowerCase();
+  // Expects an already lower-cased query, so batch callers lower-case it once, not per dataset
+  static score(dataset: CkanPackage, lowerQuery: string): number {
     let score = 0;
     
     score += this.scoreTitle(dataset.title, lowerQuery);
@@ -164,12 +254,14 @@ class UpdateFrequencyAnalyzer {
     irregular: ['irregular', 'as needed']
   } as const;
   
+  private static readonly PATTERN_ENTRIES = Object.entries(UpdateFrequencyAnalyzer.PATTERNS);
+  
   static categorize(dataset: CkanPackage): 
     'daily' | 'weekly' | 'monthly' | 'quarterly' | 'annually' | 'irregular' | 'frequent' | 'infrequent' | 'unknown' {
     const refreshRate = dataset.refresh_rate?.toLowerCase() || "";
     
     // Check explicit patterns first
-    for (const [category, patterns] of Object.entries(this.PATTERNS)) {
+    for (const [category, patterns] of this.PATTERN_ENTRIES) {
       if (patterns.some(pattern => refreshRate.includes(pattern))) {
         return category as any;
       }
@@ -194,9 +286,7 @@ class UpdateFrequencyAnalyzer {
   }
   
   private static daysSinceDate(dateString: string): number {
-    const date = new Date(dateString);
-    const now = new Date();
-    return (now.getTime() - date.getTime()) / (1000 * 3600 * 24);
+    return (Date.now() - Date.parse(dateString)) / (1000 * 3600 * 24);
   }
 }
 
@@ -233,7 +323,7 @@ class SummaryBuilder {
     resource: CkanResource, 
     fields?: any[], 
     recordCount?: number, 
-    sampleData?: Record<string, any>[]
+    sampleData?: Record<string, any[]>
   ): ResourceAnalysis {
     return {
       ...this.resource(resource),
@@ -259,11 +349,36 @@ class SummaryBuilder {
   }
 }
 
-// Legacy functions for backward compatibility
-function analyzeDatasetRelevance(dataset: CkanPackage, query: string): number {
-  return RelevanceScorer.score(dataset, query);
+// Column name -> values, where row i is the i-th element of each list. Avoids repeating every
+// field name in every sample row of the preview.
+function toColumnarRecords(
+  records: Record<string, any>[],
+  fields: CkanDatastoreField[]
+): Record<string, any[]> {
+  const columns: Record<string, any[]> = {};
+  for (const field of fields) {
+    columns[field.id] = records.map(record => record[field.id]);
+  }
+  return columns;
 }
 
+// Rank by relevance score and keep the top `limit`, without copying the (large) package dicts
+function rankDatasetsByRelevance(
+  datasets: CkanPackage[],
+  query: string,
+  limit?: number
+): { dataset: CkanPackage; relevance_score: number }[] {
+  const lowerQuery = query.toLowerCase();
+  return datasets
+    .map(dataset => ({
+      dataset,
+      relevance_score: RelevanceScorer.score(dataset, lowerQuery)
+    }))
+    .sort((a, b) => b.relevance_score - a.relevance_score)
+    .slice(0, limit);
+}
+
+// Legacy functions for backward compatibility
 function getUpdateFrequencyCategory(dataset: CkanPackage): string {
   return UpdateFrequencyAnalyzer.categorize(dataset);
 }
@@ -272,10 +387,6 @@ function createPackageSummary(pkg: CkanPackage): PackageSummary {
   return SummaryBuilder.package(pkg);
 }
 
-function createResourceSummary(resource: CkanResource): ResourceSummary {
-  return SummaryBuilder.resource(resource);
-}
-
 // Register CKAN tools on the given MCP server
 export function registerCkanTools(server: McpServer) {
   // Basic tools with improved error handling and types
@@ -291,7 +402,7 @@ export function registerCkanTools(server: McpServer) {
         const result = summary ? createPackageSummary(pkg) : pkg;
         return createToolResponse(result);
       } catch (error) {
-        console.error(`Error in get_package:`, error);
+        logToolError("get_package", error);
         return createToolResponse({ 
           error: `Failed to fetch package: ${error instanceof Error ? error.message : 'Unknown error'}` 
         });
@@ -303,29 +414,30 @@ export function registerCkanTools(server: McpServer) {
     "get_first_datastore_resource_records",
     { 
       packageId: z.string(),
-      limit: z.number().optional().default(10)
+      limit: z.number().max(CONFIG.MAX_RECORDS_LIMIT).optional().default(10)
     },
     async ({ packageId, limit }: { packageId: string; limit?: number }) => {
       try {
         const pkg = await fetchCkanPackage(packageId);
-        const dsResources = pkg.resources.filter(r => r.datastore_active);
+        const dsResource = pkg.resources.find(r => r.datastore_active);
         
-        if (!dsResources.length) {
+        if (!dsResource) {
           return createToolResponse({ message: "No active datastore resources found." });
         }
         
-        const result = await fetchCkanResource(dsResources[0].id, limit);
+        const result = await fetchCkanResource(dsResource.id, limit);
         const summary = {
-          resource_id: dsResources[0].id,
-          resource_name: dsResources[0].name,
+          resource_id: dsResource.id,
+          resource_name: dsResource.name,
           total_records: result.total,
           returned_records: result.records.length,
+          limit: limit || 10,
           fields: result.fields,
           records: result.records
         };
         return createToolResponse(summary);
       } catch (error) {
-        console.error(`Error in get_first_datastore_resource_records:`, error);
+        logToolError("get_first_datastore_resource_records", error);
         return createToolResponse({ 
           error: `Failed to fetch resource records: ${error instanceof Error ? error.message : 'Unknown error'}` 
         });
@@ -337,7 +449,7 @@ export function registerCkanTools(server: McpServer) {
     "get_resource_records",
     { 
       resourceId: z.string(),
-      limit: z.number().optional().default(10),
+      limit: z.number().max(CONFIG.MAX_RECORDS_LIMIT).optional().default(10),
       offset: z.number().optional().default(0)
     },
     async ({ resourceId, limit, offset }: { resourceId: string; limit?: number; offset?: number }) => {
@@ -354,7 +466,7 @@ export function registerCkanTools(server: McpServer) {
         };
         return createToolResponse(summary);
       } catch (error) {
-        console.error(`Error in get_resource_records:`, error);
+        logToolError("get_resource_records", error);
         return createToolResponse({ 
           error: `Failed to fetch resource records: ${error instanceof Error ? error.message : 'Unknown error'}` 
         });
@@ -370,13 +482,17 @@ export function registerCkanTools(server: McpServer) {
     }, 
     async ({ limit, offset }: { limit?: number; offset?: number }) => {
       try {
-        const fullList = await fetchCkanPackageList();
         const startIndex = offset || 0;
-        const endIndex = startIndex + (limit || 50);
-        const limitedList = fullList.slice(startIndex, endIndex);
+        // Page on the server instead of downloading every dataset name to slice locally.
+        // total_datasets is approximate: it is the search index count, fetched separately
+        // from the database-backed page, so offset + returned_count may exceed it.
+        const [totalDatasets, limitedList] = await Promise.all([
+          fetchCkanPackageCount(),
+          fetchCkanPackageList(limit || 50, startIndex)
+        ]);
         
         const summary = {
-          total_datasets: fullList.length,
+          total_datasets: totalDatasets,
           returned_count: limitedList.length,
           offset: startIndex,
           limit: limit || 50,
@@ -384,7 +500,7 @@ export function registerCkanTools(server: McpServer) {
         };
         return createToolResponse(summary);
       } catch (error) {
-        console.error(`Error in list_datasets:`, error);
+        logToolError("list_datasets", error);
         return createToolResponse({ 
           error: `Failed to list datasets: ${error instanceof Error ? error.message : 'Unknown error'}` 
         });
@@ -400,8 +516,9 @@ export function registerCkanTools(server: McpServer) {
     }, 
     async ({ query, limit }: { query: string; limit?: number }) => {
       try {
-        const result = await fetchCkanPackageSearch(query);
-        const limitedResults = result.results.slice(0, limit || 20).map(createPackageSummary);
+        // Let CKAN apply the limit rather than relying on its default page size
+        const result = await fetchCkanPackageSearch(query, limit || 20);
+        const limitedResults = result.results.map(createPackageSummary);
         
         const summary = {
           query,
@@ -411,7 +528,7 @@ export function registerCkanTools(server: McpServer) {
         };
         return createToolResponse(summary);
       } catch (error) {
-        console.error(`Error in search_datasets:`, error);
+        logToolError("search_datasets", error);
         return createToolResponse({ 
           error: `Failed to search datasets: ${error instanceof Error ? error.message : 'Unknown error'}` 
         });
@@ -439,33 +556,22 @@ export function registerCkanTools(server: McpServer) {
 				"tags",
 			]);
 
-			// Analyze and score each dataset for relevance
-			const scoredDatasets = searchResult.results.map((dataset: any) => {
-				const relevanceScore = analyzeDatasetRelevance(dataset, query);
-				return {
+			// Score and sort by relevance, then enrich only the datasets we return
+			const sortedDatasets = rankDatasetsByRelevance(searchResult.results, query, maxResults).map(
+				({ dataset, relevance_score }) => ({
 					...dataset,
-					relevance_score: relevanceScore,
+					...(includeRelevanceScore ? { relevance_score } : {}),
 					update_frequency: getUpdateFrequencyCategory(dataset),
 					resource_count: dataset.resources?.length || 0,
 					has_datastore: dataset.resources?.some((r: any) => r.datastore_active) || false,
-				};
-			});
-
-			// Sort by relevance score and limit results
-			const sortedDatasets = scoredDatasets
-				.sort((a: any, b: any) => b.relevance_score - a.relevance_score)
-				.slice(0, maxResults);
+				}),
+			);
 
 			const analysis = {
 				query,
 				total_found: searchResult.count,
 				returned_count: sortedDatasets.length,
-				datasets: includeRelevanceScore
-					? sortedDatasets
-					: sortedDatasets.map((d: any) => {
-							const { relevance_score, ...rest } = d;
-							return rest;
-						}),
+				datasets: sortedDatasets,
 				facets: searchResult.facets || {},
 			};
 
@@ -488,10 +594,20 @@ export function registerCkanTools(server: McpServer) {
 			groupByFrequency,
 		}: { query?: string; packageIds?: string[]; groupByFrequency?: boolean }) => {
 			let datasets: any[] = [];
+			const failedPackageIds: string[] = [];
 
 			if (packageIds && packageIds.length > 0) {
-				// Get specific packages
-				datasets = await Promise.all(packageIds.map((id) => fetchCkanPackage(id)));
+				// Get specific packages concurrently; one unreachable package shouldn't sink the batch.
+				// Repeated ids are fetched (and reported) once.
+				const uniqueIds = [...new Set(packageIds)];
+				const settled = await Promise.allSettled(uniqueIds.map((id) => fetchCkanPackage(id)));
+				for (const [i, outcome] of settled.entries()) {
+					if (outcome.status === "fulfilled") {
+						datasets.push(outcome.value);
+					} else {
+						failedPackageIds.push(uniqueIds[i]);
+					}
+				}
 			} else if (query) {
 				// Search for datasets
 				const searchResult = await fetchCkanPackageSearchAdvanced(query, 100);
@@ -527,6 +643,10 @@ export function registerCkanTools(server: McpServer) {
 				datasets: updateAnalysis,
 			};
 
+			if (failedPackageIds.length > 0) {
+				result.failed_package_ids = failedPackageIds;
+			}
+
 			if (groupByFrequency) {
 				const frequencyGroups = updateAnalysis.reduce((groups: any, dataset) => {
 					const freq = dataset.update_frequency;
@@ -555,7 +675,7 @@ export function registerCkanTools(server: McpServer) {
 		{
 			packageId: z.string(),
 			includeDataPreview: z.boolean().optional().default(false),
-			previewLimit: z.number().optional().default(5),
+			previewLimit: z.number().max(CONFIG.MAX_RECORDS_LIMIT).optional().default(5),
 		},
 		async ({
 			packageId,
@@ -581,17 +701,22 @@ export function registerCkanTools(server: McpServer) {
 						sample_data: null as any,
 					};
 
-					// If it's a datastore resource, get field information
+					// If it's a datastore resource, get field information (and the preview rows
+					// from the same datastore_search call, since it already returns fields and total)
 					if (resource.datastore_active) {
 						try {
-							const datastoreInfo = await fetchCkanDatastoreInfo(resource.id);
+							const wantsPreview = includeDataPreview && (previewLimit || 0) > 0;
+							const datastoreInfo = wantsPreview
+								? await fetchCkanResource(resource.id, previewLimit || 5)
+								: await fetchCkanDatastoreInfo(resource.id);
 							resourceInfo.fields = datastoreInfo.fields;
 							resourceInfo.record_count = datastoreInfo.total;
 
-							// Get sample data if requested
-							if (includeDataPreview && (previewLimit || 0) > 0) {
-								const sampleResult = await fetchCkanResource(resource.id, previewLimit || 5);
-								resourceInfo.sample_data = sampleResult.records;
+							if (wantsPreview) {
+								resourceInfo.sample_data = toColumnarRecords(
+									datastoreInfo.records,
+									datastoreInfo.fields,
+								);
 							}
 						} catch (error) {
 							// If datastore query fails, mark as inactive
@@ -678,21 +803,13 @@ export function registerCkanTools(server: McpServer) {
 			includeDataStructure?: boolean;
 			maxDatasets?: number;
 		}) => {
-			// Find relevant datasets
-			const searchResult = await fetchCkanPackageSearchAdvanced(query, 50, [
-				"organization",
-				"groups",
-				"tags",
-			]);
+			// Find relevant datasets (no facets: suggestions below are derived from the results)
+			const searchResult = await fetchCkanPackageSearchAdvanced(query, 50);
 
-			// Score and sort datasets
-			const scoredDatasets = searchResult.results
-				.map((dataset: any) => ({
-					...dataset,
-					relevance_score: analyzeDatasetRelevance(dataset, query),
-				}))
-				.sort((a: any, b: any) => b.relevance_score - a.relevance_score)
-				.slice(0, maxDatasets);
+			// Score and sort datasets, copying only the ones we keep
+			const scoredDatasets = rankDatasetsByRelevance(searchResult.results, query, maxDatasets).map(
+				({ dataset, relevance_score }) => ({ ...dataset, relevance_score }),
+			);
 
 			// Gather insights for each dataset
 			const insights = await Promise.all(
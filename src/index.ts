@@ -14,18 +14,27 @@ export class TorontoMCP extends McpAgent {
 	}
 }
 
+// Transport handlers are stateless, so build them once per isolate rather than per request
+const sseHandler = TorontoMCP.serveSSE("/sse");
+const mcpHandler = TorontoMCP.serve("/mcp");
+
 export default {
 	fetch(request: Request, env: Env, ctx: ExecutionContext) {
 		const url = new URL(request.url);
 
+		// Answered by the Worker itself, without waking an agent Durable Object
+		if (url.pathname === "/health") {
+			return Response.json({ status: "ok" });
+		}
+
 		if (url.pathname === "/sse" || url.pathname === "/sse/message") {
 			// @ts-ignore
-			return TorontoMCP.serveSSE("/sse").fetch(request, env, ctx);
+			return sseHandler.fetch(request, env, ctx);
 		}
 
 		if (url.pathname === "/mcp") {
 			// @ts-ignore
-			return TorontoMCP.serve("/mcp").fetch(request, env, ctx);
+			return mcpHandler.fetch(request, env, ctx);
 		}
 
 		return new Response("Not found", { status: 404 });
@@ -117,7 +117,8 @@ export interface ResourceAnalysis extends ResourceSummary {
   created: string;
   fields?: CkanDatastoreField[];
   record_count?: number;
-  sample_data?: Record<string, any>[];
+  // Columnar: field id -> values, row i is the i-th element of each list
+  sample_data?: Record<string, any[]>;
 }
 
 // Analysis Types
@@ -159,7 +160,12 @@ export interface CkanToolsConfig {
   readonly CKAN_BASE_URL: string;
   readonly DEFAULT_SEARCH_ROWS: number;
   readonly DEFAULT_PREVIEW_LIMIT: number;
+  readonly MAX_RECORDS_LIMIT: number;
   readonly REQUEST_TIMEOUT: number;
+  readonly CACHE_TTL: number;
+  readonly RECORDS_CACHE_TTL: number;
+  readonly CACHE_MAX_ENTRIES: number;
+  readonly CACHE_MAX_BYTES: number;
   readonly RELEVANCE_WEIGHTS: {
     readonly TITLE: number;
     readonly DESCRIPTION: number;
@@ -27,6 +27,7 @@ class DeploymentTester {
 
 		// Basic connectivity tests
 		await this.testConnectivity();
+		await this.testHealthEndpoint();
 		await this.testMCPEndpoint();
 		await this.testSSEEndpoint();
 
@@ -61,6 +62,30 @@ class DeploymentTester {
 		this.results.push(test);
 	}
 
+	private async testHealthEndpoint(): Promise<void> {
+		const test: TestResult = { name: "Health Endpoint", passed: false };
+
+		try {
+			const start = Date.now();
+			const response = await fetch(`${this.baseUrl}/health`);
+			test.responseTime = Date.now() - start;
+
+			test.passed = response.status === 200;
+			test.details = { status: response.status, statusText: response.statusText };
+
+			if (test.passed) {
+				console.log("✅ Health endpoint is responding");
+			} else {
+				console.log(`❌ Health endpoint returned status: ${response.status}`);
+			}
+		} catch (error) {
+			test.error = error instanceof Error ? error.message : "Unknown error";
+			console.log(`❌ Health endpoint test failed: ${test.error}`);
+		}
+
+		this.results.push(test);
+	}
+
 	private async testMCPEndpoint(): Promise<void> {
 		const test: TestResult = { name: "MCP Endpoint", passed: false };
 